@@ -5,4 +5,7 @@ class BooksConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "books"
 
+    def ready(self):
+        from . import signals  # noqa: F401
+
 
@@ -0,0 +1,43 @@
+"""Cached post aggregates and the version behind the post list ETag.
+
+These live in the default cache, which must be shared by every worker
+process (see CACHES in settings) for invalidation to reach all of them.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from .models import Post
+
+POST_COUNT_CACHE_KEY = "posts:count"
+POST_COUNT_CACHE_TIMEOUT = 30
+POST_LIST_VERSION_CACHE_KEY = "posts:etag"
+
+
+def get_post_count():
+    """Return the total number of posts, served from cache when possible.
+
+    The count is keyed by the list version. A count taken before a write
+    commits is stored under the old version, so it can never be served
+    alongside the version that write created.
+    """
+    key = f"{POST_COUNT_CACHE_KEY}:{get_post_list_version()}"
+    total = cache.get(key)
+    if total is None:
+        total = Post.objects.count()
+        cache.set(key, total, POST_COUNT_CACHE_TIMEOUT)
+    return total
+
+
+def invalidate_post_caches():
+    """Start a new list version so cached counts and ETags are not reused."""
+    cache.set(POST_LIST_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def get_post_list_version():
+    """Return the current post list version, creating one if none is cached."""
+    version = cache.get(POST_LIST_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(POST_LIST_VERSION_CACHE_KEY, version, None)
+    return version
@@ -0,0 +1,77 @@
+"""Batched New Relic custom metrics for the post views.
+
+Views bump a per-metric ``itertools.count`` and a background thread reports
+the totals once per second, so request threads neither take a lock nor call
+into the New Relic agent. Set ``NEW_RELIC_PER_REQUEST_METRICS`` to report
+each increment synchronously instead.
+"""
+import collections
+import itertools
+import logging
+import threading
+import time
+
+import newrelic.agent
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 1.0
+
+# next() on an itertools.count is a single C call, so it is atomic under the
+# GIL. A flush takes one value itself, which it subtracts from the delta.
+_counters = {}
+_last_values = {}
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _samples(count):
+    """Describe ``count`` samples of value 1, e.g. one per post created."""
+    return {"count": count, "total": count, "min": 1, "max": 1, "sum_of_squares": count}
+
+
+def increment(name, value=1):
+    """Count ``value`` occurrences of the custom metric ``name``."""
+    if getattr(settings, "NEW_RELIC_PER_REQUEST_METRICS", False):
+        newrelic.agent.record_custom_metric(name, _samples(value))
+        return
+    counter = _counters.get(name)
+    if counter is None:
+        counter = _counters.setdefault(name, itertools.count())
+    if value == 1:
+        next(counter)
+    else:
+        collections.deque(itertools.islice(counter, value), maxlen=0)
+    if _flusher is None:
+        _start_flusher()
+
+
+def flush():
+    """Report the counts gathered since the last flush."""
+    # The flusher runs outside any New Relic transaction, so metrics must be
+    # recorded against the application or the agent silently drops them.
+    application = newrelic.agent.application()
+    for name, counter in list(_counters.items()):
+        current = next(counter)
+        count = current - _last_values.get(name, -1) - 1
+        _last_values[name] = current
+        if count:
+            newrelic.agent.record_custom_metric(name, _samples(count), application=application)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL_SECONDS)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Failed to report post metrics to New Relic")
+
+
+def _start_flusher():
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="post-metrics-flusher", daemon=True)
+            _flusher.start()
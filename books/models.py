@@ -1,10 +1,22 @@
 from django.db import models
 
 
+class PostQuerySet(models.QuerySet):
+    def with_common(self):
+        """Apply the related-object loading every post view needs.
+
+        Post has no relations yet. When one is added, select_related() or
+        prefetch_related() it here so listing posts doesn't query per row.
+        """
+        return self
+
+
 class Post(models.Model):
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255)
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"{self.title} by {self.author}"
 
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+
+from .caching import invalidate_post_caches
+from .models import Post
+
+
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    """Use WAL so list reads don't block on writers, and fsync less often."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+
+
+connection_created.connect(set_sqlite_pragmas)
+
+
+def invalidate_post_caches_on_write(sender, **kwargs):
+    """Invalidate on any ORM write, including the shell and admin."""
+    transaction.on_commit(invalidate_post_caches)
+
+
+post_save.connect(invalidate_post_caches_on_write, sender=Post)
+post_delete.connect(invalidate_post_caches_on_write, sender=Post)
@@ -1,5 +1,216 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 
+from . import metrics
+from .caching import get_post_count, invalidate_post_caches
+from .models import Post
 
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PostBulkCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def post_json(self, payload):
+        return self.client.post(
+            reverse("post_bulk_create"), json.dumps(payload), content_type="application/json"
+        )
+
+    def test_creates_posts(self):
+        response = self.post_json([{"title": "A", "author": "X"}, {"title": "B", "author": "Y"}])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"created": 2})
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_rejects_empty_array(self):
+        response = self.post_json([])
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_malformed_payloads(self):
+        for payload in ["not json", "[1]", '{"title": "A"}', '[{"title": "A"}]']:
+            with self.subTest(payload=payload):
+                response = self.client.post(
+                    reverse("post_bulk_create"), payload, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_rejects_blank_fields(self):
+        response = self.post_json([{"title": "", "author": "X"}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+
+    def test_requires_post(self):
+        response = self.client.get(reverse("post_bulk_create"))
+
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PostListConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get(reverse("post_list"))["ETag"]
+
+        response = self.client.get(reverse("post_list"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_create(self):
+        etag = self.client.get(reverse("post_list"))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("post_create"), {"title": "New", "author": "X"})
+        response = self.client.get(reverse("post_list"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "New")
+
+    def test_page_parameter_is_not_echoed_into_etag(self):
+        response = self.client.get(reverse("post_list"), {"page": '1"\n'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("\n", response["ETag"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PostCountCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_count_taken_before_a_write_commits_is_not_reused(self):
+        real_count = Post.objects.count
+
+        def count_then_commit_write():
+            stale = real_count()
+            # Another request's write commits while this count is in flight.
+            Post.objects.bulk_create([Post(title="A", author="X")])
+            invalidate_post_caches()
+            return stale
+
+        with mock.patch.object(Post.objects, "count", count_then_commit_write):
+            self.assertEqual(get_post_count(), 0)
+
+        self.assertEqual(get_post_count(), 1)
+
+    def test_list_pagination_uses_fresh_count_after_write(self):
+        Post.objects.bulk_create([Post(title=str(i), author="X") for i in range(50)])
+        self.assertNotContains(self.client.get(reverse("post_list")), "Next")
+
+        Post.objects.bulk_create([Post(title="51", author="X")])
+        invalidate_post_caches()
+
+        self.assertContains(self.client.get(reverse("post_list")), "Next")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PostWriteTransactionTests(TransactionTestCase):
+    """Single-write views must not run in an atomic block.
+
+    On SQLite a deferred BEGIN makes the lookup take a read snapshot, and
+    upgrading it for the write fails with "database is locked" if another
+    connection committed in between.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(title="Old", author="X")
+
+    def assert_not_atomic(self, method_name, request):
+        seen = []
+        original = getattr(Post, method_name)
+
+        def spy(instance, *args, **kwargs):
+            seen.append(connection.in_atomic_block)
+            return original(instance, *args, **kwargs)
+
+        with mock.patch.object(Post, method_name, spy):
+            response = request()
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(seen, [False])
+
+    def test_create_is_not_atomic(self):
+        self.assert_not_atomic(
+            "save",
+            lambda: self.client.post(reverse("post_create"), {"title": "New", "author": "Y"}),
+        )
+
+    def test_update_is_not_atomic(self):
+        self.assert_not_atomic(
+            "save",
+            lambda: self.client.post(
+                reverse("post_update", args=[self.post.id]), {"title": "New", "author": "Y"}
+            ),
+        )
+
+    def test_delete_is_not_atomic(self):
+        self.assert_not_atomic(
+            "delete", lambda: self.client.post(reverse("post_delete", args=[self.post.id]))
+        )
+
+
+@override_settings(NEW_RELIC_PER_REQUEST_METRICS=False)
+class BatchedMetricsTests(TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.dict(metrics._counters, clear=True),
+            mock.patch.dict(metrics._last_values, clear=True),
+            mock.patch.object(metrics, "_start_flusher"),
+            mock.patch("newrelic.agent.record_custom_metric"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.start_flusher = metrics._start_flusher
+        self.record = metrics.newrelic.agent.record_custom_metric
+
+    def reported_counts(self):
+        return {call.args[0]: call.args[1]["count"] for call in self.record.call_args_list}
+
+    def test_flush_reports_counts_since_last_flush(self):
+        metrics.increment("Custom/Posts/Created")
+        metrics.increment("Custom/Posts/Deleted", 5)
+        metrics.flush()
+
+        self.assertEqual(self.reported_counts(), {"Custom/Posts/Created": 1, "Custom/Posts/Deleted": 5})
+        self.start_flusher.assert_called()
+
+    def test_second_flush_without_increments_reports_nothing(self):
+        metrics.increment("Custom/Posts/Created")
+        metrics.flush()
+        self.record.reset_mock()
+
+        metrics.flush()
+
+        self.record.assert_not_called()
+
+    def test_counts_resume_after_flush(self):
+        metrics.increment("Custom/Posts/Created", 3)
+        metrics.flush()
+        self.record.reset_mock()
+
+        metrics.increment("Custom/Posts/Created", 2)
+        metrics.flush()
+
+        self.assertEqual(self.reported_counts(), {"Custom/Posts/Created": 2})
+
+    @override_settings(NEW_RELIC_PER_REQUEST_METRICS=True)
+    def test_per_request_mode_records_synchronously(self):
+        metrics.increment("Custom/Posts/Created", 5)
+
+        self.assertEqual(self.reported_counts(), {"Custom/Posts/Created": 5})
+        self.start_flusher.assert_not_called()
+        self.assertEqual(metrics._counters, {})
@@ -1,15 +1,41 @@
+import json
+
 import newrelic.agent
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.views.decorators.http import condition, require_POST
 
+from . import metrics
+from .caching import get_post_count, get_post_list_version, invalidate_post_caches
 from .models import Post
 
+POSTS_PER_PAGE = 50
+BULK_CREATE_BATCH_SIZE = 500
+
+
+def _post_list_etag(request):
+    # ETags are scoped to the full URL, so the version alone covers every page.
+    return get_post_list_version()
 
+
+@condition(etag_func=_post_list_etag)
 def post_list(request):
-    newrelic.agent.record_custom_metric("Custom/Posts/TotalCount", Post.objects.count())
-    
-    posts = Post.objects.all().order_by("id")
-    return render(request, "books/post_list.html", {"posts": posts})
+    total = get_post_count()
+    newrelic.agent.record_custom_metric("Custom/Posts/TotalCount", total)
+
+    posts = Post.objects.with_common().only("id", "title", "author").order_by("id")
+    paginator = Paginator(posts, POSTS_PER_PAGE)
+    # Reuse the cached total so the paginator doesn't run its own COUNT(*).
+    paginator.count = total
+    page = paginator.get_page(request.GET.get("page", 1))
+    return render(
+        request,
+        "books/post_list.html",
+        {"posts": page.object_list, "page_obj": page},
+    )
 
 
 def post_create(request):
@@ -19,19 +45,45 @@ def post_create(request):
         author = request.POST.get("author")
 
         if title and author:
-            Post.objects.create(
+            post = Post.objects.create(
                 title=title,
                 author=author,
             )
-            newrelic.agent.record_custom_metric("Custom/Posts/Created", 1)
-            return redirect(reverse("post_list"))
+            metrics.increment("Custom/Posts/Created", 1)
+            response = redirect(reverse("post_list"))
+            # Lets API clients (e.g. the load test) track the new id without
+            # re-scraping the list page.
+            response["X-Post-Id"] = str(post.id)
+            return response
 
     return render(request, "books/post_form.html")
 
 
+@require_POST
+def post_bulk_create(request):
+    """Create many posts from a JSON array of {"title", "author"} objects."""
+    try:
+        rows = json.loads(request.body)
+        posts = [Post(title=row["title"], author=row["author"]) for row in rows]
+    except (ValueError, TypeError, KeyError):
+        return HttpResponseBadRequest("Expected a JSON array of objects with title and author.")
+
+    if not posts:
+        return HttpResponseBadRequest("Expected at least one post.")
+    if any(not post.title or not post.author for post in posts):
+        return HttpResponseBadRequest("Every post needs a title and an author.")
+
+    with transaction.atomic():
+        Post.objects.bulk_create(posts, batch_size=BULK_CREATE_BATCH_SIZE)
+    # bulk_create() doesn't send post_save, so invalidate explicitly.
+    invalidate_post_caches()
+    metrics.increment("Custom/Posts/Created", len(posts))
+    return JsonResponse({"created": len(posts)}, status=201)
+
+
 def post_update(request, id):
     """Show a form to edit an existing post and save changes."""
-    post = get_object_or_404(Post, id=id)
+    post = get_object_or_404(Post.objects.with_common(), id=id)
 
     if request.method == "POST":
         title = request.POST.get("title")
@@ -41,7 +93,7 @@ def post_update(request, id):
             post.title = title
             post.author = author
             post.save()
-            newrelic.agent.record_custom_metric("Custom/Posts/Updated", 1)
+            metrics.increment("Custom/Posts/Updated", 1)
             return redirect(reverse("post_list"))
 
     return render(request, "books/post_form.html", {"post": post})
@@ -49,11 +101,11 @@ def post_update(request, id):
 
 def post_delete(request, id):
     """Show a confirmation page and delete a post when confirmed."""
-    post = get_object_or_404(Post, id=id)
+    post = get_object_or_404(Post.objects.with_common(), id=id)
 
     if request.method == "POST":
         post.delete()
-        newrelic.agent.record_custom_metric("Custom/Posts/Deleted", 1)
+        metrics.increment("Custom/Posts/Deleted", 1)
         return redirect(reverse("post_list"))
 
     return render(request, "books/post_confirm_delete.html", {"post": post})
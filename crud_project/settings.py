@@ -29,6 +29,10 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-fallback-key-change-in-pro
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
+# Report New Relic custom metrics on every request instead of batching them
+# once per second in books.metrics.
+NEW_RELIC_PER_REQUEST_METRICS = os.getenv('NEW_RELIC_PER_REQUEST_METRICS', 'False') == 'True'
+
 ALLOWED_HOSTS = []
 
 
@@ -85,6 +89,16 @@ DATABASES = {
     }
 }
 
+# The post list ETag and cached post count must be visible to every worker
+# process, so use a cache shared through the filesystem rather than the
+# default per-process LocMemCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('DJANGO_CACHE_DIR', str(BASE_DIR / '.django_cache')),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -1,9 +1,11 @@
 """
 Locust metrics collector: memory and scalability (Django process + system).
 """
-import csv
+import atexit
+import glob
 import time
 import os
+import sqlite3
 from datetime import datetime
 from locust import events
 import threading
@@ -15,16 +17,50 @@ except ImportError:
     PSUTIL_AVAILABLE = False
     print("Warning: psutil not available. Memory metrics will be limited.")
 
+METRICS_FILE_BUFFER_SIZE = 1 << 18
+# 0 means the metrics file is only flushed when the test stops.
+FLUSH_EVERY_ROWS = 0
+COLLECTOR_JOIN_TIMEOUT = 5
+COLLECT_INTERVAL_SECONDS = 1.0
+# While Locust has no users and no new requests, only sample every
+# IDLE_SAMPLE_INTERVAL_SECONDS, after an initial baseline period.
+IDLE_SAMPLE_INTERVAL_SECONDS = 10.0
+IDLE_BASELINE_SECONDS = 5.0
+
+# Every field is numeric or an ISO timestamp, so no CSV quoting is needed and
+# rows can be formatted directly. Lines end in \r\n to match csv.writer.
+METRICS_HEADER = (
+    "timestamp,elapsed_seconds,active_users,total_requests,"
+    "requests_per_second,memory_usage_mb,memory_percent,cpu_percent,"
+    "system_memory_mb,system_memory_percent,system_cpu_percent,total_posts\r\n"
+)
+METRICS_ROW_FORMAT = (
+    "{timestamp},{elapsed:.2f},{active_users},{total_requests},"
+    "{rps:.2f},{memory_mb:.2f},{memory_percent:.2f},{cpu_percent:.2f},"
+    "{system_memory_mb:.2f},{system_memory_percent:.2f},{system_cpu_percent:.2f},{total_posts}\r\n"
+)
+
+# MAX(id) is a primary key index probe rather than a full table scan. Deleted
+# rows are still counted, so this is an upper bound on the number of posts,
+# which is fine as a scalability growth signal.
+TOTAL_POSTS_QUERY = "SELECT COALESCE(MAX(id), 0) FROM books_post"
+
 
 class MetricsCollector:
-    def __init__(self, django_pid=None, output_dir="results", environment=None):
+    def __init__(self, django_pid=None, output_dir="results", environment=None,
+                 flush_every_rows=FLUSH_EVERY_ROWS):
         self.output_dir = output_dir
         self.environment = environment
         self.metrics_file = None
-        self.csv_writer = None
+        self.flush_every_rows = flush_every_rows
+        self._rows_since_flush = 0
+        self._conn = None
+        self._proc = None
+        self._last_total_requests = None
+        self._last_sample_time = None
         self.start_time = None
         self.running = False
-        self.metrics_lock = threading.Lock()
+        self.collector_thread = None
         self.psutil_working = PSUTIL_AVAILABLE
         self.django_pid = django_pid
         if not self.django_pid and self.psutil_working:
@@ -32,24 +68,54 @@ class MetricsCollector:
         os.makedirs(output_dir, exist_ok=True)
         events.test_start.add_listener(self.on_test_start)
         events.test_stop.add_listener(self.on_test_stop)
+        atexit.register(self._finalize)
     
+    def _read_pid_file(self):
+        pid_file = os.environ.get('DJANGO_PID_FILE')
+        if not pid_file:
+            return None
+        try:
+            with open(pid_file) as f:
+                pid = int(f.read().strip())
+        except (OSError, ValueError) as e:
+            print(f"Warning: Cannot read DJANGO_PID_FILE {pid_file}: {e}")
+            return None
+        if not psutil.pid_exists(pid):
+            print(f"Warning: DJANGO_PID_FILE {pid_file} names PID {pid}, which is not running")
+            return None
+        return pid
+
+    def _iter_runserver_pids(self):
+        if os.path.isdir('/proc'):
+            for path in glob.glob('/proc/[0-9]*/cmdline'):
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                if b'manage.py' in data and b'runserver' in data:
+                    yield int(path.split('/')[2])
+            return
+        for proc in psutil.process_iter(['pid', 'cmdline']):
+            cmdline = proc.info.get('cmdline') or []
+            cmdline_str = ' '.join(str(c) for c in cmdline)
+            if 'manage.py' in cmdline_str and 'runserver' in cmdline_str:
+                yield proc.info['pid']
+
     def _find_django_process(self):
         if not self.psutil_working:
             return None
+        pid = self._read_pid_file()
+        if pid:
+            return pid
         try:
             best_pid = None
             best_rss = 0
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            # Only matching candidates get a psutil.Process; the runserver
+            # autoreloader child is the one with the larger RSS.
+            for pid in self._iter_runserver_pids():
                 try:
-                    cmdline = proc.info.get('cmdline', [])
-                    if not cmdline:
-                        continue
-                    cmdline_str = ' '.join(str(c) for c in cmdline)
-                    if 'manage.py' not in cmdline_str or 'runserver' not in cmdline_str:
-                        continue
-                    pid = proc.info['pid']
-                    p = psutil.Process(pid)
-                    rss = p.memory_info().rss
+                    rss = psutil.Process(pid).memory_info().rss
                     if rss > best_rss:
                         best_rss = rss
                         best_pid = pid
@@ -64,41 +130,85 @@ class MetricsCollector:
             print(f"Warning: Error finding Django process: {e}")
             self.psutil_working = False
         return None
+
+    def _get_django_process(self):
+        """Return a cached psutil.Process for the Django PID."""
+        if self._proc is None:
+            if not self.django_pid:
+                return None
+            self._proc = psutil.Process(self.django_pid)
+            # Prime cpu_percent so later non-blocking calls diff against this one.
+            self._proc.cpu_percent(interval=None)
+        return self._proc
     
     def on_test_start(self, environment, **kwargs):
         self.start_time = time.time()
         self.running = True
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         metrics_path = os.path.join(self.output_dir, f"metrics_memory_scalability_{timestamp}.csv")
-        self.metrics_file = open(metrics_path, 'w', newline='')
-        self.csv_writer = csv.writer(self.metrics_file)
-        self.csv_writer.writerow([
-            'timestamp', 'elapsed_seconds', 'active_users', 'total_requests',
-            'requests_per_second', 'memory_usage_mb', 'memory_percent', 'cpu_percent',
-            'system_memory_mb', 'system_memory_percent', 'system_cpu_percent'
-        ])
+        # Each start gets its own timestamped file. O_APPEND only guards the
+        # rare case of two starts in the same second sharing a file: rows are
+        # appended rather than overwritten, and the header is written once.
+        fd = os.open(metrics_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        is_new_file = os.fstat(fd).st_size == 0
+        self.metrics_file = os.fdopen(fd, 'a', buffering=METRICS_FILE_BUFFER_SIZE, newline='')
+        self._rows_since_flush = 0
+        self._last_total_requests = None
+        self._last_sample_time = None
+        if is_new_file:
+            self.metrics_file.write(METRICS_HEADER)
+        if self.psutil_working:
+            try:
+                self._get_django_process()
+                psutil.cpu_percent(interval=None)
+            except psutil.NoSuchProcess:
+                self._proc = None
+                self.django_pid = self._find_django_process()
+            except (PermissionError, OSError):
+                self.psutil_working = False
         self.collector_thread = threading.Thread(target=self._collect_metrics_loop, daemon=True)
         self.collector_thread.start()
         
         print(f"Metrics collector started (Django PID: {self.django_pid})")
     
     def on_test_stop(self, environment, **kwargs):
+        self._finalize()
+        print("Metrics collector stopped.")
+
+    def _finalize(self):
+        # Also registered with atexit: rows are only flushed when the test
+        # stops, so an exit that skips test_stop would otherwise lose them.
         self.running = False
+        # The collector thread is the only writer; wait for it to finish its
+        # current tick before closing the file instead of locking every row.
+        if self.collector_thread:
+            self.collector_thread.join(timeout=COLLECTOR_JOIN_TIMEOUT)
+            self.collector_thread = None
         if self.metrics_file:
+            self.metrics_file.flush()
             self.metrics_file.close()
-        print("Metrics collector stopped.")
+            self.metrics_file = None
+        self._close_db()
     
     def _collect_metrics_loop(self):
+        # Sleep until fixed monotonic deadlines so the time spent collecting
+        # doesn't stretch the sampling interval. Missed ticks are skipped
+        # rather than replayed in a burst.
+        deadline = time.monotonic()
         while self.running:
             try:
                 self._collect_metrics()
-                time.sleep(1)
             except Exception as e:
                 print(f"Error collecting metrics: {e}")
-                time.sleep(1)
+            deadline += COLLECT_INTERVAL_SECONDS
+            now = time.monotonic()
+            if now > deadline:
+                missed = (now - deadline) // COLLECT_INTERVAL_SECONDS + 1
+                deadline += missed * COLLECT_INTERVAL_SECONDS
+            time.sleep(deadline - now)
     
     def _collect_metrics(self):
-        if not self.csv_writer:
+        if not self.metrics_file:
             return
         timestamp = datetime.now()
         elapsed_time = time.time() - self.start_time if self.start_time else 0
@@ -106,16 +216,29 @@ class MetricsCollector:
         active_users = stats.get('active_users', 0)
         total_requests = stats.get('total_requests', 0)
         rps = stats.get('rps', 0)
+        now = time.monotonic()
+        idle = active_users == 0 and total_requests == self._last_total_requests
+        self._last_total_requests = total_requests
+        if (idle and elapsed_time >= IDLE_BASELINE_SECONDS
+                and now - self._last_sample_time < IDLE_SAMPLE_INTERVAL_SECONDS):
+            return
+        self._last_sample_time = now
         memory_mb = 0
         memory_percent = 0
         cpu_percent = 0
         if self.django_pid and self.psutil_working:
             try:
-                process = psutil.Process(self.django_pid)
-                memory_info = process.memory_info()
+                process = self._get_django_process()
+                # oneshot() reads each /proc file once for all three calls.
+                with process.oneshot():
+                    memory_info = process.memory_info()
+                    memory_percent = process.memory_percent(memtype='rss')
+                    cpu_percent = process.cpu_percent(interval=None)
                 memory_mb = memory_info.rss / (1024 * 1024)
-                memory_percent = process.memory_percent()
-                cpu_percent = process.cpu_percent(interval=0.1)
+            except psutil.NoSuchProcess:
+                # Django restarted (e.g. autoreload); re-resolve its PID.
+                self._proc = None
+                self.django_pid = self._find_django_process()
             except (PermissionError, OSError):
                 self.psutil_working = False
             except Exception:
@@ -128,27 +251,31 @@ class MetricsCollector:
                 system_memory = psutil.virtual_memory()
                 system_memory_mb = system_memory.used / (1024 * 1024)
                 system_memory_percent = system_memory.percent
-                system_cpu_percent = psutil.cpu_percent(interval=0.1)
+                system_cpu_percent = psutil.cpu_percent(interval=None)
             except (PermissionError, OSError):
                 self.psutil_working = False
             except Exception:
                 pass
-        with self.metrics_lock:
-            self.csv_writer.writerow([
-                timestamp.isoformat(),
-                f"{elapsed_time:.2f}",
-                active_users,
-                total_requests,
-                f"{rps:.2f}",
-                f"{memory_mb:.2f}",
-                f"{memory_percent:.2f}",
-                f"{cpu_percent:.2f}",
-                f"{system_memory_mb:.2f}",
-                f"{system_memory_percent:.2f}",
-                f"{system_cpu_percent:.2f}"
-            ])
+        total_posts = self._get_total_posts()
+        self.metrics_file.write(METRICS_ROW_FORMAT.format(
+            timestamp=timestamp.isoformat(),
+            elapsed=elapsed_time,
+            active_users=active_users,
+            total_requests=total_requests,
+            rps=rps,
+            memory_mb=memory_mb,
+            memory_percent=memory_percent,
+            cpu_percent=cpu_percent,
+            system_memory_mb=system_memory_mb,
+            system_memory_percent=system_memory_percent,
+            system_cpu_percent=system_cpu_percent,
+            total_posts=total_posts,
+        ))
+        self._rows_since_flush += 1
+        if self.flush_every_rows and self._rows_since_flush >= self.flush_every_rows:
             self.metrics_file.flush()
-    
+            self._rows_since_flush = 0
+
     def _get_locust_stats(self):
         try:
             if self.environment and hasattr(self.environment, 'stats'):
@@ -167,17 +294,30 @@ class MetricsCollector:
             pass
         return {'active_users': 0, 'total_requests': 0, 'rps': 0}
     
+    def _get_db(self):
+        if self._conn is None:
+            db_path = os.path.join(os.path.dirname(__file__), 'db.sqlite3')
+            if not os.path.exists(db_path):
+                return None
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA query_only=1")
+        return self._conn
+
+    def _close_db(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
     def _get_total_posts(self):
         try:
-            import sqlite3
-            db_path = os.path.join(os.path.dirname(__file__), 'db.sqlite3')
-            if os.path.exists(db_path):
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM books_post")
-                count = cursor.fetchone()[0]
-                conn.close()
-                return count
+            conn = self._get_db()
+            if conn is not None:
+                return conn.execute(TOTAL_POSTS_QUERY).fetchone()[0]
+        except sqlite3.Error:
+            self._close_db()
         except Exception:
             pass
         return 0
@@ -1,7 +1,9 @@
 """Locust load test: Posts CRUD (list, create, update, delete)."""
 from locust import HttpUser, task, between, events
 from bs4 import BeautifulSoup
+import itertools
 import random
+import re
 import string
 import os
 
@@ -12,22 +14,39 @@ except ImportError:
     METRICS_ENABLED = False
     print("Metrics collector not available. Install psutil for memory tracking: pip install psutil")
 
+BULK_CREATE_SIZE = 100
+_POST_ACTION_RE = re.compile(r'/posts/(update|delete)/(\d+)/')
+
+# Random strings are drawn from a pool built once at import, so tasks don't
+# pay for random.choices() and a join on every call.
+_ALPHABET = string.ascii_letters + string.digits
+_RANDOM_STRING_LENGTH = 10
+_RANDOM_POOL_SIZE = 4096
+_RANDOM_POOL = [
+    ''.join(random.choices(_ALPHABET, k=_RANDOM_STRING_LENGTH)) for _ in range(_RANDOM_POOL_SIZE)
+]
+_random_index = itertools.count()
+
 
 class PostsUser(HttpUser):
     wait_time = between(1, 3)
 
     def on_start(self):
-        response = self.client.get("/posts/")
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            csrf_token = soup.find('input', {'name': 'csrfmiddlewaretoken'})
-            if csrf_token:
-                self.csrf_token = csrf_token.get('value')
-            else:
-                self.csrf_token = response.cookies.get('csrftoken', '')
-        else:
-            self.csrf_token = ''
         self.created_post_ids = []
+        self.post_list_etag = None
+        self.referers = {
+            path: f"{self.host}{path}" for path in ("/posts/create/", "/posts/bulk/")
+        }
+        self.refresh_csrf_token()
+
+    def refresh_csrf_token(self):
+        # /posts/ has no form, so fetch the create form once to get the
+        # csrftoken cookie; it is then reused by every POST from this user.
+        response = self.client.get("/posts/create/")
+        csrf_token = self.client.cookies.get('csrftoken')
+        if not csrf_token and response.status_code == 200:
+            csrf_token = self.get_csrf_token(response)
+        self.csrf_token = csrf_token or ''
     
     def get_csrf_token(self, response):
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -36,122 +55,106 @@ class PostsUser(HttpUser):
             return csrf_input.get('value')
         return response.cookies.get('csrftoken', '')
     
-    def generate_random_string(self, length=10):
-        return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+    def get_post_ids(self, response, action):
+        return [post_id for kind, post_id in _POST_ACTION_RE.findall(response.text) if kind == action]
+
+    def generate_random_string(self, length=_RANDOM_STRING_LENGTH):
+        if length > _RANDOM_STRING_LENGTH:
+            return ''.join(random.choices(_ALPHABET, k=length))
+        return _RANDOM_POOL[next(_random_index) % _RANDOM_POOL_SIZE][:length]
+
+    def submit_form(self, path, data, action, ok_statuses=(200, 302), **kwargs):
+        """POST with the cached CSRF token, refreshing it once on a 403.
+
+        ``data`` is sent as a form with the token added; pass ``data=None``
+        to send another body (e.g. ``json=``) with only the token header.
+        """
+        for attempt in range(2):
+            headers = {
+                'X-CSRFToken': self.csrf_token,
+                'Referer': self.referers.get(path) or f"{self.host}{path}"
+            }
+            if data is not None:
+                kwargs['data'] = {**data, 'csrfmiddlewaretoken': self.csrf_token}
+            with self.client.post(
+                path,
+                headers=headers,
+                catch_response=True,
+                **kwargs
+            ) as response:
+                if response.status_code in ok_statuses:
+                    response.success()
+                    return response
+                response.failure(f"Failed to {action} post: {response.status_code}")
+            if response.status_code != 403 or attempt:
+                return response
+            self.refresh_csrf_token()
+        return response
 
     @task(3)
     def view_post_list(self):
-        with self.client.get("/posts/", catch_response=True) as response:
+        headers = {'If-None-Match': self.post_list_etag} if self.post_list_etag else None
+        with self.client.get("/posts/", headers=headers, catch_response=True) as response:
             if response.status_code == 200:
+                self.post_list_etag = response.headers.get('ETag')
+                response.success()
+            elif response.status_code == 304:
                 response.success()
             else:
                 response.failure(f"Failed to load post list: {response.status_code}")
     
     @task(2)
     def create_post(self):
-        form_response = self.client.get("/posts/create/")
-        csrf_token = self.get_csrf_token(form_response)
-        if not csrf_token:
-            csrf_token = form_response.cookies.get('csrftoken', '')
-
         title = f"Test Post {self.generate_random_string(8)}"
         author = f"Author {self.generate_random_string(6)}"
-        headers = {
-            'X-CSRFToken': csrf_token,
-            'Referer': f"{self.host}/posts/create/"
-        }
-        
-        with self.client.post(
-            "/posts/create/",
-            data={
-                'title': title,
-                'author': author,
-                'csrfmiddlewaretoken': csrf_token
-            },
-            headers=headers,
-            cookies=form_response.cookies,
-            catch_response=True
-        ) as response:
-            if response.status_code in [200, 302]:
-                response.success()
-            else:
-                response.failure(f"Failed to create post: {response.status_code}")
-    
+        response = self.submit_form(
+            "/posts/create/", {'title': title, 'author': author}, 'create', allow_redirects=False
+        )
+        post_id = response.headers.get('X-Post-Id')
+        if response.status_code == 302 and post_id:
+            self.created_post_ids.append(post_id)
+
     @task(1)
-    def update_post(self):
+    def bulk_create_posts(self):
+        rows = [
+            {
+                'title': f"Bulk Post {self.generate_random_string(8)}",
+                'author': f"Bulk Author {self.generate_random_string(6)}"
+            }
+            for _ in range(BULK_CREATE_SIZE)
+        ]
+        self.submit_form("/posts/bulk/", None, 'bulk create', ok_statuses=(201,), json=rows)
+
+    def scrape_post_id(self, action):
         list_response = self.client.get("/posts/")
         if list_response.status_code != 200:
-            return
-        soup = BeautifulSoup(list_response.text, 'html.parser')
-        update_links = soup.find_all('a', href=lambda x: x and '/posts/update/' in x)
-        if not update_links:
-            return
-        update_url = update_links[0].get('href')
-        post_id = update_url.split('/')[-2] if update_url else None
-        
-        if not post_id:
-            return
-        form_response = self.client.get(f"/posts/update/{post_id}/")
-        csrf_token = self.get_csrf_token(form_response)
-        if not csrf_token:
-            csrf_token = form_response.cookies.get('csrftoken', '')
+            return None
+        post_ids = self.get_post_ids(list_response, action)
+        return post_ids[0] if post_ids else None
+    
+    @task(1)
+    def update_post(self):
+        if self.created_post_ids:
+            post_id = self.created_post_ids[-1]
+        else:
+            post_id = self.scrape_post_id('update')
+            if not post_id:
+                return
         title = f"Updated Post {self.generate_random_string(8)}"
         author = f"Updated Author {self.generate_random_string(6)}"
-        
-        headers = {
-            'X-CSRFToken': csrf_token,
-            'Referer': f"{self.host}/posts/update/{post_id}/"
-        }
-        
-        with self.client.post(
-            f"/posts/update/{post_id}/",
-            data={
-                'title': title,
-                'author': author,
-                'csrfmiddlewaretoken': csrf_token
-            },
-            headers=headers,
-            cookies=form_response.cookies,
-            catch_response=True
-        ) as response:
-            if response.status_code in [200, 302]:
-                response.success()
-            else:
-                response.failure(f"Failed to update post: {response.status_code}")
+        response = self.submit_form(f"/posts/update/{post_id}/", {'title': title, 'author': author}, 'update')
+        if response.status_code == 404 and post_id in self.created_post_ids:
+            self.created_post_ids.remove(post_id)
     
     @task(1)
     def delete_post(self):
-        list_response = self.client.get("/posts/")
-        if list_response.status_code != 200:
-            return
-        soup = BeautifulSoup(list_response.text, 'html.parser')
-        delete_links = soup.find_all('a', href=lambda x: x and '/posts/delete/' in x)
-        if not delete_links:
-            return
-        delete_url = delete_links[0].get('href')
-        post_id = delete_url.split('/')[-2] if delete_url else None
-        if not post_id:
-            return
-        form_response = self.client.get(f"/posts/delete/{post_id}/")
-        csrf_token = self.get_csrf_token(form_response)
-        if not csrf_token:
-            csrf_token = form_response.cookies.get('csrftoken', '')
-        headers = {
-            'X-CSRFToken': csrf_token,
-            'Referer': f"{self.host}/posts/delete/{post_id}/"
-        }
-        
-        with self.client.post(
-            f"/posts/delete/{post_id}/",
-            data={'csrfmiddlewaretoken': csrf_token},
-            headers=headers,
-            cookies=form_response.cookies,
-            catch_response=True
-        ) as response:
-            if response.status_code in [200, 302]:
-                response.success()
-            else:
-                response.failure(f"Failed to delete post: {response.status_code}")
+        if self.created_post_ids:
+            post_id = self.created_post_ids.pop()
+        else:
+            post_id = self.scrape_post_id('delete')
+            if not post_id:
+                return
+        self.submit_form(f"/posts/delete/{post_id}/", {}, 'delete')
 
 
 @events.init.add_listener